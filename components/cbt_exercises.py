@@ -2,7 +2,7 @@
 
 import streamlit as st # type: ignore
 from datetime import datetime
-from utils.gemini_client import GeminiClient # 🌟 CHANGE: Import GeminiClient
+from utils.gemini_client import get_client # 🌟 CHANGE: Import shared GeminiClient accessor
 from data.cbt_prompts import CBT_EXERCISES, COGNITIVE_DISTORTIONS
 
 def render_cbt_exercises():
@@ -13,7 +13,7 @@ def render_cbt_exercises():
     
     # Initialize Gemini client
     if 'gemini_client' not in st.session_state: # 🌟 CHANGE: Client variable name
-        st.session_state.gemini_client = GeminiClient() # 🌟 CHANGE: Use GeminiClient
+        st.session_state.gemini_client = get_client() # 🌟 CHANGE: Reuse process-wide GeminiClient
     
     # Create tabs
     tab1, tab2, tab3, tab4 = st.tabs(["📋 Thought Record", "🔍 Identify Patterns", "📚 Learn CBT", "📊 Your Progress"])
@@ -62,10 +62,21 @@ def render_thought_record():
                 }
                 
                 with st.spinner("Getting AI insights..."):
-                    # 🌟 CHANGE: Use gemini_client and new method
-                    ai_insights = st.session_state.gemini_client.generate_cbt_insight(thought_record)
+                    mood_context = st.session_state.data_manager.get_mood_context(7)
+                    recent_themes = st.session_state.data_manager.get_journal_themes()[:3]
+                    # One Gemini round-trip for insights, journal prompt and crisis check
+                    feedback = st.session_state.gemini_client.generate_combined_feedback(
+                        thought_record, mood_context, recent_themes
+                    )
+                    ai_insights = feedback.get("insights") or {}
                     thought_record["ai_insights"] = ai_insights
                 
+                if st.session_state.get("crisis_detector") and feedback.get("crisis"):
+                    risk_assessment = st.session_state.crisis_detector.assess_with_ai_analysis(
+                        f"{situation}\n{thoughts}", feedback["crisis"]
+                    )
+                    st.session_state.crisis_detector.trigger_crisis_intervention(risk_assessment)
+                
                 st.session_state.data_manager.save_cbt_record(thought_record)
                 st.success("Thought record saved! 📝")
                 
@@ -75,18 +86,29 @@ def render_thought_record():
                     st.success(f"Great work! Your emotional intensity decreased by {improvement} points! 📉")
                 
                 st.markdown("### 🤖 AI Insights")
-                if ai_insights.get("cognitive_distortions"):
-                    st.write("**Possible cognitive distortions:** " + ", ".join(ai_insights["cognitive_distortions"]))
-                if ai_insights.get("balanced_thoughts"):
-                    st.write("**Alternative balanced thoughts:**")
-                    for thought in ai_insights["balanced_thoughts"]: st.write(f"• {thought}")
-                if ai_insights.get("encouragement"):
-                    st.info(ai_insights["encouragement"])
+                render_ai_insights(ai_insights)
+                
+                journal_prompt = feedback.get("prompt") or {}
+                if journal_prompt.get("prompt"):
+                    st.markdown("### ✍️ Reflect Further")
+                    st.info(f"**{journal_prompt['prompt']}**")
+                    for i, question in enumerate(journal_prompt.get("follow_up_questions", []), 1):
+                        st.write(f"{i}. {question}")
             else:
                 st.warning("Please fill in at least the situation and thoughts fields.")
 
-# The rest of the functions (render_pattern_identification, render_cbt_education, render_cbt_progress)
-# do not use the AI client, so they can remain as they are. You can copy them from your original file.
+def render_ai_insights(ai_insights):
+    """Show the AI insights for one thought record"""
+    if ai_insights.get("cognitive_distortions"):
+        st.write("**Possible cognitive distortions:** " + ", ".join(ai_insights["cognitive_distortions"]))
+    if ai_insights.get("balanced_thoughts"):
+        st.write("**Alternative balanced thoughts:**")
+        for thought in ai_insights["balanced_thoughts"]: st.write(f"• {thought}")
+    if ai_insights.get("encouragement"):
+        st.info(ai_insights["encouragement"])
+
+# render_pattern_identification and render_cbt_education do not use the AI
+# client, so they can remain as they are. You can copy them from your original file.
 
 def render_pattern_identification():
     st.subheader("🔍 Identify Thought Patterns")
@@ -98,4 +120,36 @@ def render_cbt_education():
 
 def render_cbt_progress():
     st.subheader("📊 Your CBT Progress")
-    # ... (code remains the same)
\ No newline at end of file
+    
+    records = st.session_state.get('cbt_records', [])
+    if not records:
+        st.info("📋 Your thought records will appear here once you save one!")
+        return
+    
+    missing = [r for r in records if not r.get("ai_insights") or r["ai_insights"].get("error")]
+    if missing and st.session_state.get('gemini_client') is None:
+        st.warning("AI insights are unavailable right now. Check your Gemini API key.")
+    elif missing and st.button(f"🔄 Get AI insights for {len(missing)} saved record(s)"):
+        with st.spinner("Analyzing your thought records..."):
+            thought_fields = ["situation", "emotions", "thoughts", "intensity_before", "evidence_for",
+                              "evidence_against", "balanced_thought", "intensity_after"]
+            insights = st.session_state.gemini_client.batch_cbt_insights(
+                [{k: r.get(k) for k in thought_fields} for r in missing]
+            )
+            for record, ai_insights in zip(missing, insights):
+                record["ai_insights"] = ai_insights
+        st.success("AI insights updated! 🤖")
+    
+    for record in sorted(records, key=lambda x: x["timestamp"], reverse=True):
+        with st.expander(f"📋 {datetime.fromisoformat(record['timestamp']).strftime('%B %d, %Y')} - {(record.get('situation') or '')[:50]}"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Intensity Before", record.get('intensity_before', 0))
+            with col2:
+                change = record.get('intensity_after', 0) - record.get('intensity_before', 0)
+                st.metric("Intensity After", record.get('intensity_after', 0), f"{change:+d}", delta_color="inverse")
+            st.markdown(f"**Thoughts:** {record.get('thoughts', '')}")
+            if record.get('balanced_thought'):
+                st.markdown(f"**Balanced thought:** {record['balanced_thought']}")
+            
+            render_ai_insights(record.get('ai_insights') or {})
@@ -1,7 +1,7 @@
 # components/chat_interface.py
 
 import streamlit as st # type: ignore
-from utils.gemini_client import GeminiClient
+from utils.gemini_client import get_client
 from utils.crisis_detection import CrisisDetector
 from utils.data_manager import DataManager
 import uuid
@@ -12,7 +12,7 @@ def render_chat_interface():
     
     # create session_start if missing
     if 'session_start' not in st.session_state:
-        st.session_state.session_start = _import_('datetime').datetime.now().isoformat()
+        st.session_state.session_start = __import__('datetime').datetime.now().isoformat()
 
     # Initialize data_manager if not present (generate anonymous id)
     if 'data_manager' not in st.session_state:
@@ -21,7 +21,7 @@ def render_chat_interface():
     # Initialize Gemini client (show friendly message if missing)
     if 'gemini_client' not in st.session_state:
         try:
-            st.session_state.gemini_client = GeminiClient()
+            st.session_state.gemini_client = get_client()
         except Exception as e:
             st.error(f"Gemini client init error: {e}")
             st.session_state.gemini_client = None
@@ -55,7 +55,6 @@ def render_chat_interface():
 
     # Chat input
     user_input = st.chat_input("What's on your mind?")
-    print("DEBUG-SENDING-TO-GEMINI:", user_input) ##added lines
 
     if user_input:
         # Save user message
@@ -68,22 +67,26 @@ def render_chat_interface():
         risk_assessment = st.session_state.crisis_detector.analyze_text_for_crisis(user_input)
         crisis_detected = st.session_state.crisis_detector.trigger_crisis_intervention(risk_assessment)
         
-        conversation_history = st.session_state.data_manager.get_conversation_history()
-        
         try:
             if st.session_state.gemini_client is None:
                 raise RuntimeError("Gemini client unavailable. Check API key.")
             
-            ai_response = st.session_state.gemini_client.get_empathetic_response(
-                user_input, 
-                st.session_state.current_persona,
-                conversation_history
-            )
-            print("DEBUG-GEMINI-RESPONSE:", ai_response) ##added lines
+            with st.chat_message("user"):
+                st.write(user_input)
+
+            # Stream tokens to the UI as they arrive instead of waiting for the full reply
+            with st.chat_message("assistant"):
+                ai_response = st.write_stream(
+                    st.session_state.gemini_client.stream_empathetic_response(
+                        user_input, 
+                        st.session_state.current_persona
+                    )
+                )
 
-            if crisis_detected:
-                follow_up = st.session_state.crisis_detector.get_crisis_follow_up_message(risk_assessment["final_risk_level"])
-                ai_response = f"{ai_response}\n\n{follow_up}"
+                if crisis_detected:
+                    follow_up = st.session_state.crisis_detector.get_crisis_follow_up_message(risk_assessment["final_risk_level"])
+                    st.write(follow_up)
+                    ai_response = f"{ai_response}\n\n{follow_up}"
             
             st.session_state.data_manager.save_chat_message("assistant", ai_response, persona=st.session_state.current_persona)
         except Exception as e:
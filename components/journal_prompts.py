@@ -1,6 +1,6 @@
 import streamlit as st # type: ignore
 from datetime import datetime
-from utils.gemini_client import GeminiClient  # 🌟 CHANGE: Import GeminiClient
+from utils.gemini_client import get_client  # 🌟 CHANGE: Import shared GeminiClient accessor
 from data.journal_prompts import JOURNAL_PROMPTS, CBT_PROMPTS
 
 def render_journal_prompts():
@@ -11,7 +11,7 @@ def render_journal_prompts():
     
     # Initialize Gemini client
     if 'gemini_client' not in st.session_state: # 🌟 CHANGE: Client variable name
-        st.session_state.gemini_client = GeminiClient() # 🌟 CHANGE: Use GeminiClient
+        st.session_state.gemini_client = get_client() # 🌟 CHANGE: Reuse process-wide GeminiClient
     
     # Create tabs
     tab1, tab2, tab3 = st.tabs(["✍️ New Entry", "📚 Your Entries", "🤖 AI-Personalized"])
@@ -184,12 +184,8 @@ def render_ai_personalized_prompts():
     
     if st.button("✨ Generate Personalized Prompt", type="primary"):
         with st.spinner("Creating your personalized prompt..."):
-            recent_moods = st.session_state.data_manager.get_recent_mood_data(7)
             recent_themes = st.session_state.data_manager.get_journal_themes()
-            mood_context = {
-                "recent_average": sum(m["overall_mood"] for m in recent_moods) / len(recent_moods) if recent_moods else 5,
-                "common_emotions": [m.get("emotions", []) for m in recent_moods],
-            }
+            mood_context = st.session_state.data_manager.get_mood_context(7)
             try:
                 # 🌟 CHANGE: Use gemini_client and new method
                 personalized_prompt = st.session_state.gemini_client.generate_personalized_journal_prompt(
@@ -1,8 +1,15 @@
 import re
+import logging
+import numpy as np
 import streamlit as st
-from utils.gemini_client import GeminiClient
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+from utils.gemini_client import get_client, run_async
 from data.crisis_keywords import CRISIS_KEYWORDS, SEVERITY_WEIGHTS
 
+logger = logging.getLogger(__name__)
 
 _CANON_LEVELS = {
     "low": "LOW",
@@ -16,47 +23,166 @@ _CANON_LEVELS = {
     "SEVERE": "CRITICAL"
 }
 
+# Longest the chat waits on the AI crisis check before going keyword-only
+AI_CRISIS_TIMEOUT_SECONDS = 10
+
+_RISK_LEVELS = ["low", "moderate", "high", "critical"]
+_RISK_RANK = {level: i for i, level in enumerate(_RISK_LEVELS)}
+
+# Keyword -> category lookup and a single alternation pattern, built once at
+# import so each message is scanned in one pass. Keys are lowercased to match
+# the lowercased message text.
+_KEYWORD_TO_CATEGORY = {
+    keyword.lower(): category
+    for category, keywords in CRISIS_KEYWORDS.items()
+    for keyword in keywords
+}
+_KEYWORD_LIST = list(_KEYWORD_TO_CATEGORY)
+_KEYWORD_IDS = {keyword: i for i, keyword in enumerate(_KEYWORD_LIST)}
+
+# The lookahead is zero-width, so finditer tries every start position and
+# overlapping hits ("how to kill" / "kill myself") are all found. At one
+# start position only the longest keyword is reported.
+_ALL_KEYWORDS_PATTERN = re.compile(
+    r"(?=\b(" + "|".join(map(re.escape, sorted(_KEYWORD_LIST, key=len, reverse=True))) + r")\b)"
+)
+
+# Keywords nested inside a longer keyword ("suicide" in "suicide plan"), so
+# a hit on the longer phrase also credits the shorter ones it contains
+_NESTED_KEYWORD_IDS = [
+    [
+        j for j, other in enumerate(_KEYWORD_LIST)
+        if j != i and re.search(r"\b" + re.escape(other) + r"\b", keyword)
+    ]
+    for i, keyword in enumerate(_KEYWORD_LIST)
+]
+
+# Severity weight per keyword id, so scoring is one array reduction
+_KEYWORD_WEIGHTS = np.fromiter(
+    (SEVERITY_WEIGHTS.get(_KEYWORD_TO_CATEGORY[k], 1) for k in _KEYWORD_LIST),
+    dtype=np.int32,
+    count=len(_KEYWORD_LIST)
+)
+
+
+def _regex_keyword_ids(text_lower):
+    ids = []
+    for m in _ALL_KEYWORDS_PATTERN.finditer(text_lower):
+        i = _KEYWORD_IDS[m.group(1)]
+        ids.append(i)
+        ids.extend(_NESTED_KEYWORD_IDS[i])
+    return ids
+
+
+def _on_hyperscan_match(pattern_id, start, end, flags, context):
+    context.append(pattern_id)
+
+
+def _hyperscan_keyword_ids(db, text_lower):
+    # Hyperscan reports every match, overlapping ones included
+    ids = []
+    db.scan(text_lower.encode(), match_event_handler=_on_hyperscan_match, context=ids)
+    return ids
+
+
+def _build_hyperscan_db():
+    # Multi-pattern SIMD matcher; pattern id is the index into _KEYWORD_LIST
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[(r"\b" + re.escape(keyword) + r"\b").encode() for keyword in _KEYWORD_LIST],
+        ids=list(range(len(_KEYWORD_LIST))),
+        # UTF8 + UCP give \b the same Unicode word boundaries as re on str
+        flags=[
+            hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST
+            | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        ] * len(_KEYWORD_LIST)
+    )
+
+    # Both backends must score a message the same. Scanning every keyword
+    # (and all of them joined) checks nested and overlapping hits, and the
+    # accented variants check word boundaries next to non-ASCII letters and
+    # punctuation; on any difference the regex backend is used instead.
+    samples = _KEYWORD_LIST + [" ".join(_KEYWORD_LIST)]
+    samples += [f"é{keyword} «{keyword}» {keyword}ñ" for keyword in _KEYWORD_LIST]
+    for sample in samples:
+        if set(_hyperscan_keyword_ids(db, sample)) != set(_regex_keyword_ids(sample)):
+            return None
+    return db
+
+
+try:
+    _HYPERSCAN_DB = _build_hyperscan_db() if hyperscan else None
+except Exception:
+    _HYPERSCAN_DB = None
+
 
 class CrisisDetector:
-    def _init_(self):
+    keyword_to_category = _KEYWORD_TO_CATEGORY
+    hyperscan_db = _HYPERSCAN_DB
+    keyword_weights = _KEYWORD_WEIGHTS
+
+    def __init__(self):
         try:
-            self.gemini_client = st.session_state.get("gemini_client") or GeminiClient()
+            self.gemini_client = get_client()
         except Exception:
             self.gemini_client = None
 
-        self.crisis_keywords = CRISIS_KEYWORDS
-        self.severity_weights = SEVERITY_WEIGHTS
-
     def analyze_text_for_crisis(self, text):
+        # The keyword scan takes microseconds, so it runs first; a critical
+        # keyword score already fixes the combined level at critical, and
+        # the Gemini round-trip is only made when it can change the result
         keyword_risk = self._keyword_based_detection(text)
 
-        ai_analysis = {
+        if keyword_risk["risk_level"] == "critical":
+            ai_analysis = {
+                "risk_level": "CRITICAL",
+                "keywords_detected": [],
+                "analysis": "skipped_due_to_keyword_critical"
+            }
+        else:
+            try:
+                ai_analysis = run_async(self._ai_based_detection(text), timeout=AI_CRISIS_TIMEOUT_SECONDS)
+            except TimeoutError:
+                logger.warning("AI crisis analysis timed out, using keyword analysis only")
+                ai_analysis = self._ai_unavailable()
+
+        combined = self._combine_risk_assessments(keyword_risk, ai_analysis)
+        return combined
+
+    def assess_with_ai_analysis(self, text, ai_analysis):
+        # For flows where the AI crisis analysis arrived as part of a
+        # combined Gemini response, so no extra round-trip is needed.
+        keyword_risk = self._keyword_based_detection(text)
+        return self._combine_risk_assessments(keyword_risk, ai_analysis)
+
+    def _ai_unavailable(self):
+        return {
             "risk_level": "LOW",
             "keywords_detected": [],
             "analysis": "AI unavailable"
         }
 
+    async def _ai_based_detection(self, text):
+        ai_analysis = self._ai_unavailable()
+
         if self.gemini_client:
             try:
-                result = self.gemini_client.analyze_text_for_crisis(text)
+                result = await self.gemini_client.aanalyze_text_for_crisis(text)
                 if isinstance(result, dict):
                     ai_analysis = result
-            except Exception:
-                pass
+            except Exception as e:
+                logger.warning("AI crisis analysis failed, using keyword analysis only: %s", e)
 
-        combined = self._combine_risk_assessments(keyword_risk, ai_analysis)
-        return combined
+        return ai_analysis
 
     def _keyword_based_detection(self, text):
         text_lower = text.lower()
-        detected_keywords = []
-        total_score = 0
+        ids = self._match_keyword_ids(text_lower)
 
-        for category, keywords in self.crisis_keywords.items():
-            for keyword in keywords:
-                if re.search(r"\b" + re.escape(keyword) + r"\b", text_lower):
-                    detected_keywords.append((keyword, category))
-                    total_score += self.severity_weights.get(category, 1)
+        detected_keywords = [
+            (_KEYWORD_LIST[i], self.keyword_to_category[_KEYWORD_LIST[i]]) for i in ids
+        ]
+        total_score = int(self.keyword_weights[ids].sum())
 
         if total_score >= 10:
             level = "critical"
@@ -74,33 +200,30 @@ class CrisisDetector:
             "method": "keyword_analysis"
         }
 
-    def _combine_risk_assessments(self, keyword_risk, ai):
-        order = ["low", "moderate", "high", "critical"]
-
-        raw_ai = ai.get("risk_level", "LOW")
-        ai_level = _CANON_LEVELS.get(str(raw_ai), "LOW").lower()
+    def _match_keyword_ids(self, text_lower):
+        """Return the id of each matched keyword once, in scan order"""
+        if self.hyperscan_db is not None:
+            ids = _hyperscan_keyword_ids(self.hyperscan_db, text_lower)
+        else:
+            ids = _regex_keyword_ids(text_lower)
 
-        try:
-            ai_rank = order.index(ai_level)
-        except:
-            ai_rank = 0
+        return np.fromiter(dict.fromkeys(ids), dtype=np.int32)
 
-        try:
-            kw_rank = order.index(keyword_risk.get("risk_level", "low"))
-        except:
-            kw_rank = 0
-
-        final_level = order[max(ai_rank, kw_rank)]
+    def _combine_risk_assessments(self, keyword_risk, ai):
+        # Canonical level names are case-insensitive ("SEVERE" -> critical)
+        ai_level = _CANON_LEVELS.get(str(ai.get("risk_level", "LOW")).lower(), "LOW").lower()
+        ai_rank = _RISK_RANK[ai_level]
+        kw_rank = _RISK_RANK.get(keyword_risk.get("risk_level", "low"), 0)
 
-        if keyword_risk["risk_level"] == "critical" or raw_ai.lower() in ("critical", "severe"):
-            final_level = "critical"
+        # max() already escalates to critical when either layer is critical
+        idx = max(ai_rank, kw_rank)
 
         return {
-            "final_risk_level": final_level,
+            "final_risk_level": _RISK_LEVELS[idx],
             "keyword_analysis": keyword_risk,
             "ai_analysis": ai,
-            "requires_intervention": final_level in ["high", "critical"],
-            "immediate_crisis": final_level == "critical"
+            "requires_intervention": idx >= 2,
+            "immediate_crisis": idx == 3
         }
 
     def trigger_crisis_intervention(self, assessment):
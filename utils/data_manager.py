@@ -2,8 +2,18 @@ import json
 import streamlit as st # type: ignore
 from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
-import base64
 import os
+from collections import deque
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Session-state flag set once the data structures below exist
+SESSION_INITIALIZED_KEY = '_data_manager_initialized'
+
+# Oldest chat messages are dropped beyond this many
+CHAT_HISTORY_LIMIT = 1000
 
 class DataManager:
     def __init__(self, user_id):
@@ -11,17 +21,21 @@ class DataManager:
         self.encryption_key = self._get_or_create_encryption_key()
         self.fernet = Fernet(self.encryption_key)
         
-        # Initialize session state data structures
-        if 'chat_history' not in st.session_state:
-            st.session_state.chat_history = []
-        if 'mood_entries' not in st.session_state:
-            st.session_state.mood_entries = []
-        if 'journal_entries' not in st.session_state:
-            st.session_state.journal_entries = []
-        if 'cbt_records' not in st.session_state:
-            st.session_state.cbt_records = []
-        if 'crisis_events' not in st.session_state:
-            st.session_state.crisis_events = []
+        # Initialize session state data structures (once per session)
+        if not st.session_state.get(SESSION_INITIALIZED_KEY):
+            if 'chat_history' not in st.session_state:
+                st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_LIMIT)
+            if '_msg_seq' not in st.session_state:
+                st.session_state._msg_seq = 0
+            if 'mood_entries' not in st.session_state:
+                st.session_state.mood_entries = []
+            if 'journal_entries' not in st.session_state:
+                st.session_state.journal_entries = []
+            if 'cbt_records' not in st.session_state:
+                st.session_state.cbt_records = []
+            if 'crisis_events' not in st.session_state:
+                st.session_state.crisis_events = []
+            st.session_state[SESSION_INITIALIZED_KEY] = True
     
     def _get_or_create_encryption_key(self):
         """Generate or retrieve encryption key for this session"""
@@ -31,23 +45,32 @@ class DataManager:
     
     def encrypt_data(self, data):
         """Encrypt sensitive data"""
-        json_data = json.dumps(data).encode()
-        encrypted_data = self.fernet.encrypt(json_data)
-        return base64.b64encode(encrypted_data).decode()
+        # Binary msgpack payload; the Fernet token is URL-safe bytes already,
+        # so it is returned as-is for session storage
+        if msgpack:
+            payload = msgpack.packb(data, use_bin_type=True)
+        else:
+            payload = json.dumps(data).encode()
+        return self.fernet.encrypt(payload)
     
     def decrypt_data(self, encrypted_data):
         """Decrypt sensitive data"""
         try:
-            encrypted_bytes = base64.b64decode(encrypted_data.encode())
-            decrypted_data = self.fernet.decrypt(encrypted_bytes)
-            return json.loads(decrypted_data.decode())
+            if isinstance(encrypted_data, str):
+                encrypted_data = encrypted_data.encode('ascii')
+            decrypted_data = self.fernet.decrypt(encrypted_data)
+            if msgpack:
+                return msgpack.unpackb(decrypted_data, raw=False)
+            return json.loads(decrypted_data)
         except:
             return None
     
     def save_chat_message(self, role, content, persona=None, risk_level=None):
         """Save chat message with optional metadata"""
+        # Monotonic id stays unique even after old messages are trimmed
+        st.session_state._msg_seq += 1
         message = {
-            "id": len(st.session_state.chat_history),
+            "id": st.session_state._msg_seq,
             "timestamp": datetime.now().isoformat(),
             "role": role,
             "content": content,
@@ -122,6 +145,14 @@ class DataManager:
         
         return recent_entries
     
+    def get_mood_context(self, days=7):
+        """Summarize recent moods as context for AI prompts"""
+        recent_moods = self.get_recent_mood_data(days)
+        return {
+            "recent_average": sum(m["overall_mood"] for m in recent_moods) / len(recent_moods) if recent_moods else 5,
+            "common_emotions": [m.get("emotions", []) for m in recent_moods],
+        }
+    
     def get_mood_trends(self):
         """Analyze mood trends for visualization"""
         if not st.session_state.mood_entries:
@@ -182,25 +213,13 @@ class DataManager:
     
     def delete_all_data(self):
         """Securely delete all user data"""
-        st.session_state.chat_history = []
+        st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_LIMIT)
         st.session_state.mood_entries = []
         st.session_state.journal_entries = []
         st.session_state.cbt_records = []
         st.session_state.crisis_events = []
+        st.session_state.pop('_gemini_history', None)
         
         # Generate new encryption key
         st.session_state.encryption_key = Fernet.generate_key()
         self.fernet = Fernet(st.session_state.encryption_key)
-    
-    def get_conversation_history(self, limit=10):
-        """Get recent conversation history for AI context"""
-        recent_messages = st.session_state.chat_history[-limit:]
-        conversation = []
-        
-        for msg in recent_messages:
-            conversation.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        
-        return conversation
@@ -1,11 +1,44 @@
 import os
 import json
+import asyncio
+import logging
 import streamlit as st
 import google.generativeai as genai
 import time
+import threading
+import tempfile
+import copy
+import itertools
+import weakref
+import concurrent.futures
+from typing import Literal
+from pydantic import BaseModel
+from google import genai as google_genai
 from google.genai.errors import ServerError
+from google.ai import generativelanguage as glm
+from google.api_core.exceptions import ResourceExhausted
+
+logger = logging.getLogger(__name__)
 
 MODEL = "gemini-2.0-flash"
+# Used once retries on MODEL are exhausted
+FALLBACK_MODEL = "gemini-1.5-flash"
+
+# API key rotation: a key that hits a 429 sits out for the cooldown, and
+# each key allows this many in-flight async requests
+KEY_COOLDOWN_SECONDS = 60
+KEY_CONCURRENCY = 15
+# Pause before retrying after a 503, or a 429 with every key cooling down
+RETRY_BACKOFF_SECONDS = 1.5
+
+# Session-state key for the per-session Gemini chat contents
+CHAT_HISTORY_KEY = "_gemini_history"
+# Prior chat messages sent as context (same as the original last-10 window).
+# Once over the cap, the oldest CHAT_TRIM_BLOCK messages are dropped in one
+# go, so the prefix stays byte-stable between trims. Both must be even to
+# keep user/model pairs aligned.
+MAX_CHAT_CONTEXT_MESSAGES = 10
+CHAT_TRIM_BLOCK = 6
 
 BASE_SYSTEM_INSTRUCTION = """
 You are a compassionate, non-judgmental, and supportive mental wellness companion.
@@ -16,6 +49,19 @@ You must NEVER give medical advice, diagnose, or pretend to be a human professio
 Always prioritize safety, be warm, concise, and emotionally validating.
 """
 
+PERSONA_STYLES = {
+    "peer": "Respond like a warm, supportive peer listener.",
+    "mentor": "Respond like a kind, encouraging mentor.",
+    "therapist": "Respond like a gentle therapeutic companion (no diagnosis)."
+}
+
+# Full system instruction per persona, built once at import
+_PERSONA_INSTRUCTIONS = {
+    persona: BASE_SYSTEM_INSTRUCTION
+    + f"\nPersona style: {persona_text}\n\nRespond empathically, briefly, and safely."
+    for persona, persona_text in PERSONA_STYLES.items()
+}
+
 CRISIS_INSTRUCTION = """
 You are a crisis risk analysis AI.
 
@@ -27,50 +73,229 @@ Return ONLY a JSON object:
 }
 """
 
+CBT_INSIGHT_INSTRUCTION = """
+Return a JSON object with ONLY:
+- cognitive_distortions
+- balanced_thoughts
+- encouragement
+
+The user's CBT thought record follows as compact JSON.
+"""
+
+JOURNAL_PROMPT_INSTRUCTION = """
+Return a JSON object with:
+- prompt
+- follow_up_questions
+
+The user's mood context (compact JSON) and recent themes follow.
+"""
+
+# Max in-flight Gemini requests for batch jobs (Tier-1 rate limits)
+BATCH_CONCURRENCY = 15
+
+BATCH_TERMINAL_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED"
+}
+
+COMBINED_FEEDBACK_INSTRUCTION = """
+You are reviewing a user's CBT thought record. In ONE JSON object, return:
+
+1. insights: cognitive_distortions, balanced_thoughts, encouragement
+2. prompt: a personalized journaling prompt and follow_up_questions
+3. crisis: risk_level (LOW | MODERATE | HIGH | SEVERE), keywords_detected, analysis
+"""
+
+
+def _compact_json(data):
+    # No indentation or padding: whitespace in prompts is billed as tokens
+    return json.dumps(data, indent=None, separators=(",", ":"))
+
+
+def _parse_structured(raw, schema):
+    # The response_schema makes Gemini emit this shape; validation catches
+    # anything else (including an empty reply) as a ValueError
+    if raw is None:
+        raise ValueError("Empty Gemini response")
+    return schema.model_validate_json(raw).model_dump()
+
+
+class CBTInsight(BaseModel):
+    cognitive_distortions: list[str]
+    balanced_thoughts: list[str]
+    encouragement: str
+
+
+# CBTInsight as a REST response schema, for batch requests that are written
+# out as raw JSON rather than built by the SDK
+CBT_INSIGHT_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "cognitive_distortions": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "balanced_thoughts": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "encouragement": {"type": "STRING"}
+    },
+    "required": ["cognitive_distortions", "balanced_thoughts", "encouragement"]
+}
+
+
+class JournalPrompt(BaseModel):
+    prompt: str
+    follow_up_questions: list[str]
+
+
+class CrisisResult(BaseModel):
+    risk_level: Literal["LOW", "MODERATE", "HIGH", "SEVERE"]
+    keywords_detected: list[str]
+    analysis: str
+
+
+class CombinedFeedback(BaseModel):
+    insights: CBTInsight
+    prompt: JournalPrompt
+    crisis: CrisisResult
+
+
+def _load_api_keys():
+    # GEMINI_API_KEYS (JSON list of strings) takes precedence over a single
+    # GEMINI_API_KEY
+    raw = os.environ.get("GEMINI_API_KEYS")
+    if raw:
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, list) and parsed and all(isinstance(key, str) and key for key in parsed):
+            return parsed
+        logger.warning("Ignoring GEMINI_API_KEYS: expected a JSON list of non-empty strings")
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    return [api_key] if api_key else []
+
+
 class GeminiClient:
-    def _init_(self):
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
+    def __init__(self):
+        api_keys = _load_api_keys()
+        if not api_keys:
             raise EnvironmentError("❌ GEMINI_API_KEY not set.")
 
-        genai.configure(api_key=api_key)
+        # The first key is the SDK default
+        genai.configure(api_key=api_keys[0])
+        self.api_key = api_keys[0]
+
+        # One sync service client per key for round-robin rotation. Async
+        # clients are tied to an event loop, so they are built lazily per
+        # running loop (see _loop_resources)
+        self._api_keys = api_keys
+        self._key_clients = [
+            glm.GenerativeServiceClient(client_options={"api_key": key})
+            for key in api_keys
+        ]
+        self._key_cycle = itertools.cycle(range(len(api_keys)))
+        self._key_lock = threading.Lock()
+        self._disabled_until = [0.0] * len(api_keys)
+        self._loop_resources_by_loop = weakref.WeakKeyDictionary()
+
         self.model = genai.GenerativeModel(MODEL)
+        self._batch_client = None
+        self._chat_models = {}
+
+    # ------------------------------------------------------
+    # API KEY ROTATION (round-robin, cooldown on 429)
+    # ------------------------------------------------------
+    def _next_key(self):
+        now = time.time()
+        with self._key_lock:
+            for _ in range(len(self._key_clients)):
+                i = next(self._key_cycle)
+                if self._disabled_until[i] <= now:
+                    return i
+            # Every key is cooling down: use the one that recovers first
+            return min(range(len(self._key_clients)), key=self._disabled_until.__getitem__)
+
+    def _disable_key(self, i):
+        with self._key_lock:
+            self._disabled_until[i] = time.time() + KEY_COOLDOWN_SECONDS
+
+    def _rate_limit_backoff(self):
+        # Seconds to wait before the next attempt: none while another key is
+        # available, else until the first key recovers, capped at the backoff
+        with self._key_lock:
+            wait = min(self._disabled_until) - time.time()
+        return min(max(wait, 0.0), RETRY_BACKOFF_SECONDS)
+
+    def _model_for_key(self, model, i):
+        # google.generativeai only exposes a process-wide configure(), so a
+        # per-key copy of the model gets that key's service client
+        keyed = copy.copy(model)
+        keyed._client = self._key_clients[i]
+        return keyed
+
+    def _amodel_for_key(self, model, i):
+        keyed = copy.copy(model)
+        keyed._async_client = self._loop_resources()[0][i]
+        return keyed
+
+    def _loop_resources(self):
+        # grpc-aio channels and asyncio semaphores are bound to the loop they
+        # are created on, so each running loop gets its own per-key set
+        loop = asyncio.get_running_loop()
+        resources = self._loop_resources_by_loop.get(loop)
+        if resources is None:
+            resources = (
+                [glm.GenerativeServiceAsyncClient(client_options={"api_key": key}) for key in self._api_keys],
+                [asyncio.Semaphore(KEY_CONCURRENCY) for _ in self._api_keys]
+            )
+            self._loop_resources_by_loop[loop] = resources
+        return resources
+
+    def _key_semaphore(self, i):
+        return self._loop_resources()[1][i]
 
     # ------------------------------------------------------
     # SAFE INTERNAL GEMINI CALL (retry + fallback)
     # ------------------------------------------------------
-    def _generate(self, prompt, json_output=False, max_retries=3):
+    def _generate(self, prompt, json_output=False, max_retries=3, response_schema=None, model=None, fallback_model=None):
+        generation_config = {
+            "response_mime_type": (
+                "application/json" if json_output else "text/plain"
+            )
+        }
+        if response_schema is not None:
+            generation_config["response_schema"] = response_schema
+
+        model = model or self.model
         for attempt in range(max_retries):
+            key = self._next_key()
             try:
-                response = self.model.generate_content(
+                response = self._model_for_key(model, key).generate_content(
                     prompt,
-                    generation_config={
-                        "response_mime_type": (
-                            "application/json" if json_output else "text/plain"
-                        )
-                    }
+                    generation_config=generation_config
                 )
                 return response.text
 
+            except ResourceExhausted:
+                self._disable_key(key)
+                time.sleep(self._rate_limit_backoff())
+                continue
+
             except ServerError as e:
                 if "503" in str(e) or "overloaded" in str(e).lower():
-                    time.sleep(1.5)
+                    time.sleep(RETRY_BACKOFF_SECONDS)
                     continue
                 raise e
 
             except Exception as e:
                 raise RuntimeError(f"Gemini request failed: {e}")
 
-        # Fallback model
+        # Fallback model (callers with a system_instruction pass a matching one)
         try:
-            fallback = genai.GenerativeModel("gemini-1.5-flash")
+            fallback = self._model_for_key(fallback_model or genai.GenerativeModel(FALLBACK_MODEL), self._next_key())
             response = fallback.generate_content(
                 prompt,
-                generation_config={
-                    "response_mime_type": (
-                        "application/json" if json_output else "text/plain"
-                    )
-                }
+                generation_config=generation_config
             )
             return response.text
 
@@ -78,75 +303,276 @@ class GeminiClient:
             return None
 
     # ------------------------------------------------------
-    # NORMAL EMPATHETIC CHAT
+    # ASYNC GEMINI CALL (same retry + fallback, non-blocking)
     # ------------------------------------------------------
-    def get_empathetic_response(self, user_input, persona, conversation_history):
-        personas = {
-            "peer": "Respond like a warm, supportive peer listener.",
-            "mentor": "Respond like a kind, encouraging mentor.",
-            "therapist": "Respond like a gentle therapeutic companion (no diagnosis)."
+    async def _agenerate(self, prompt, json_output=False, max_retries=3, response_schema=None, model=None, fallback_model=None):
+        generation_config = {
+            "response_mime_type": (
+                "application/json" if json_output else "text/plain"
+            )
         }
+        if response_schema is not None:
+            generation_config["response_schema"] = response_schema
 
-        persona_text = personas.get(persona, personas["therapist"])
+        model = model or self.model
+        for attempt in range(max_retries):
+            key = self._next_key()
+            try:
+                async with self._key_semaphore(key):
+                    response = await self._amodel_for_key(model, key).generate_content_async(
+                        prompt,
+                        generation_config=generation_config
+                    )
+                return response.text
 
-        chat_text = ""
-        for msg in conversation_history[-10:]:
-            chat_text += f"{msg['role'].upper()}: {msg['content']}\n"
+            except ResourceExhausted:
+                self._disable_key(key)
+                await asyncio.sleep(self._rate_limit_backoff())
+                continue
 
-        chat_text += f"USER: {user_input}"
+            except ServerError as e:
+                if "503" in str(e) or "overloaded" in str(e).lower():
+                    await asyncio.sleep(RETRY_BACKOFF_SECONDS)
+                    continue
+                raise e
 
-        full_prompt = f"""
-{BASE_SYSTEM_INSTRUCTION}
+            except Exception as e:
+                raise RuntimeError(f"Gemini request failed: {e}")
 
-Persona style: {persona_text}
+        # Fallback model (callers with a system_instruction pass a matching one)
+        try:
+            fallback = self._amodel_for_key(fallback_model or genai.GenerativeModel(FALLBACK_MODEL), self._next_key())
+            response = await fallback.generate_content_async(
+                prompt,
+                generation_config=generation_config
+            )
+            return response.text
 
-Conversation history:
-{chat_text}
+        except:
+            return None
 
-Respond empathically, briefly, and safely.
-"""
+    # ------------------------------------------------------
+    # NORMAL EMPATHETIC CHAT
+    # ------------------------------------------------------
+    def _chat_model(self, persona, model_name=MODEL):
+        # One model per persona (and per model name, so the fallback model
+        # gets the same safety and persona instructions), with the
+        # instructions as system_instruction so the conversation contents
+        # carry only the turns themselves
+        if persona not in _PERSONA_INSTRUCTIONS:
+            persona = "therapist"
+        if (model_name, persona) not in self._chat_models:
+            self._chat_models[(model_name, persona)] = genai.GenerativeModel(
+                model_name, system_instruction=_PERSONA_INSTRUCTIONS[persona]
+            )
+        return self._chat_models[(model_name, persona)]
+
+    def _chat_history(self):
+        # Per-session list of already-built content turns. Only new turns are
+        # appended, so the request prefix stays byte-stable until the next
+        # block trim (which also lets Gemini's implicit prefix caching apply).
+        if CHAT_HISTORY_KEY not in st.session_state:
+            st.session_state[CHAT_HISTORY_KEY] = []
+        return st.session_state[CHAT_HISTORY_KEY]
+
+    def _record_chat_turn(self, history, user_turn, reply):
+        history.append(user_turn)
+        history.append({"role": "model", "parts": [reply]})
+        if len(history) > MAX_CHAT_CONTEXT_MESSAGES:
+            del history[:CHAT_TRIM_BLOCK]
+
+    # ------------------------------------------------------
+    # STREAMING EMPATHETIC CHAT (yields text as it arrives)
+    # ------------------------------------------------------
+    def stream_empathetic_response(self, user_input, persona):
+        history = self._chat_history()
+        user_turn = {"role": "user", "parts": [user_input]}
+        contents = history + [user_turn]
+        model = self._chat_model(persona)
+
+        chunks = []
+        try:
+            keyed_model = self._model_for_key(model, self._next_key())
+            for chunk in keyed_model.generate_content(contents, stream=True):
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+            if chunks:
+                self._record_chat_turn(history, user_turn, "".join(chunks))
+                return
+        except Exception as e:
+            if chunks:
+                raise RuntimeError(f"Gemini stream interrupted: {e}")
 
-        reply = self._generate(full_prompt)
-        return reply or "I'm here with you — could you share a little more?"
+        # Nothing streamed: fall back to the retrying non-streaming call
+        reply = self._generate(contents, model=model, fallback_model=self._chat_model(persona, FALLBACK_MODEL))
+        if reply:
+            self._record_chat_turn(history, user_turn, reply)
+        yield reply or "I'm here with you — could you share a little more?"
 
     # ------------------------------------------------------
     # CBT JSON INSIGHT
     # ------------------------------------------------------
     def generate_cbt_insight(self, thought_record: dict) -> dict:
-        prompt = f"""
-Return a JSON object with ONLY:
-- cognitive_distortions
-- balanced_thoughts
-- encouragement
+        prompt = self._build_cbt_prompt(thought_record)
 
-Here is the user's CBT thought record:
-{json.dumps(thought_record, indent=2)}
-"""
-        raw = self._generate(prompt, json_output=True)
+        raw = self._generate(prompt, json_output=True, response_schema=CBTInsight)
         try:
-            return json.loads(raw)
-        except:
+            return _parse_structured(raw, CBTInsight)
+        except ValueError:
             return {"error": "Failed to parse CBT JSON."}
 
+    async def agenerate_cbt_insight(self, thought_record: dict) -> dict:
+        prompt = self._build_cbt_prompt(thought_record)
+
+        raw = await self._agenerate(prompt, json_output=True, response_schema=CBTInsight)
+        try:
+            return _parse_structured(raw, CBTInsight)
+        except ValueError:
+            return {"error": "Failed to parse CBT JSON."}
+
+    def _build_cbt_prompt(self, thought_record):
+        return f"{CBT_INSIGHT_INSTRUCTION}\n{_compact_json(thought_record)}"
+
+    # ------------------------------------------------------
+    # BATCH CBT INSIGHTS (concurrent, rate-limit bounded)
+    # ------------------------------------------------------
+    async def abatch_cbt_insights(self, thought_records, max_concurrency=BATCH_CONCURRENCY):
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def one(record):
+            async with semaphore:
+                try:
+                    return await self.agenerate_cbt_insight(record)
+                except Exception as e:
+                    logger.warning("CBT insight generation failed: %s", e)
+                    return {"error": "Failed to generate CBT insight."}
+
+        return await asyncio.gather(*(one(record) for record in thought_records))
+
+    def batch_cbt_insights(self, thought_records):
+        return run_async(self.abatch_cbt_insights(thought_records))
+
+    # ------------------------------------------------------
+    # GEMINI BATCH MODE (server-side bulk jobs, half price)
+    # ------------------------------------------------------
+    def _get_batch_client(self):
+        # Batch jobs are only exposed by the google.genai SDK
+        if self._batch_client is None:
+            self._batch_client = google_genai.Client(api_key=self.api_key)
+        return self._batch_client
+
+    def submit_cbt_batch(self, thought_records):
+        """Upload one JSONL request per record and start a batch job; returns the job name"""
+        client = self._get_batch_client()
+
+        # The file holds users' thought records, so it is removed even if
+        # writing or uploading fails
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            path = f.name
+        try:
+            with open(path, "w") as f:
+                for i, record in enumerate(thought_records):
+                    request = {
+                        "key": f"record-{i}",
+                        "request": {
+                            "contents": [{"parts": [{"text": f"{CBT_INSIGHT_INSTRUCTION}\n{_compact_json(record)}"}]}],
+                            "generation_config": {
+                                "response_mime_type": "application/json",
+                                "response_schema": CBT_INSIGHT_RESPONSE_SCHEMA
+                            }
+                        }
+                    }
+                    f.write(json.dumps(request) + "\n")
+
+            uploaded = client.files.upload(file=path, config={"mime_type": "jsonl"})
+        finally:
+            os.remove(path)
+
+        job = client.batches.create(
+            model=MODEL,
+            src=uploaded.name,
+            config={"display_name": "cbt-insights"}
+        )
+        return job.name
+
+    def wait_for_cbt_batch(self, job_name, num_records, poll_interval=30, timeout=600):
+        """Poll a batch job until it finishes; returns insights in submission order.
+
+        Batch jobs can take up to 24h, so this raises TimeoutError after
+        ``timeout`` seconds; the job keeps running and can be waited on again.
+        """
+        client = self._get_batch_client()
+        deadline = time.monotonic() + timeout
+
+        job = client.batches.get(name=job_name)
+        while job.state.name not in BATCH_TERMINAL_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Gemini batch job {job_name} still {job.state.name} after {timeout}s")
+            time.sleep(min(poll_interval, remaining))
+            job = client.batches.get(name=job_name)
+
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Gemini batch job ended in {job.state.name}")
+
+        results = {}
+        content = client.files.download(file=job.dest.file_name).decode("utf-8")
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            try:
+                text = item["response"]["candidates"][0]["content"]["parts"][0]["text"]
+                results[item["key"]] = _parse_structured(text, CBTInsight)
+            except:
+                results[item["key"]] = {"error": "Failed to parse CBT JSON."}
+
+        return [
+            results.get(f"record-{i}", {"error": "Missing batch result."})
+            for i in range(num_records)
+        ]
+
     # ------------------------------------------------------
     # JOURNAL PROMPT JSON
     # ------------------------------------------------------
     def generate_personalized_journal_prompt(self, mood_context, recent_themes):
+        prompt = f"""{JOURNAL_PROMPT_INSTRUCTION}
+Mood context: {_compact_json(mood_context)}
+Themes: {recent_themes}
+"""
+        raw = self._generate(prompt, json_output=True, response_schema=JournalPrompt)
+        try:
+            return _parse_structured(raw, JournalPrompt)
+        except ValueError:
+            return {"error": "Failed to parse journal prompt JSON."}
+
+    # ------------------------------------------------------
+    # COMBINED CBT + JOURNAL + CRISIS JSON (single round-trip)
+    # ------------------------------------------------------
+    def generate_combined_feedback(self, thought_record: dict, mood_context, recent_themes) -> dict:
         prompt = f"""
-Return a JSON object with:
-- prompt
-- follow_up_questions
+{COMBINED_FEEDBACK_INSTRUCTION}
 
-Mood context:
-{json.dumps(mood_context, indent=2)}
+[CBT THOUGHT RECORD]
+{_compact_json(thought_record)}
 
-Themes: {recent_themes}
+[MOOD CONTEXT]
+{_compact_json(mood_context)}
+
+[RECENT JOURNAL THEMES]
+{recent_themes}
 """
-        raw = self._generate(prompt, json_output=True)
+        raw = self._generate(prompt, json_output=True, response_schema=CombinedFeedback)
         try:
-            return json.loads(raw)
-        except:
-            return {"error": "Failed to parse journal prompt JSON."}
+            return _parse_structured(raw, CombinedFeedback)
+        except ValueError:
+            # No crisis result rather than a guessed one; callers skip it
+            return {
+                "insights": {"error": "Failed to parse CBT JSON."},
+                "prompt": {"error": "Failed to parse journal prompt JSON."},
+                "crisis": None
+            }
 
     # ------------------------------------------------------
     # CRISIS DETECTION JSON
@@ -154,13 +580,64 @@ Themes: {recent_themes}
     def analyze_text_for_crisis(self, user_input: str):
         prompt = f"{CRISIS_INSTRUCTION}\n\nUser message: {user_input}"
 
-        raw = self._generate(prompt, json_output=True)
+        # Raises ValueError on a malformed reply so the caller treats the
+        # AI layer as unavailable instead of assuming a risk level
+        raw = self._generate(prompt, json_output=True, response_schema=CrisisResult)
+        return _parse_structured(raw, CrisisResult)
 
-        try:
-            return json.loads(raw)
-        except:
-            return {
-                "risk_level": "MODERATE",
-                "keywords_detected": [],
-                "analysis": "Could not parse AI JSON."
-            }
+    async def aanalyze_text_for_crisis(self, user_input: str):
+        prompt = f"{CRISIS_INSTRUCTION}\n\nUser message: {user_input}"
+
+        raw = await self._agenerate(prompt, json_output=True, response_schema=CrisisResult)
+        return _parse_structured(raw, CrisisResult)
+
+
+# ------------------------------------------------------
+# SHARED EVENT LOOP (async Gemini calls from sync Streamlit code)
+# ------------------------------------------------------
+# The SDK's grpc-aio channels are bound to the loop they were created on,
+# so every async call runs on one long-lived loop instead of a fresh
+# asyncio.run() loop per message.
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop():
+    global _LOOP
+    if _LOOP is None:
+        with _LOOP_LOCK:
+            if _LOOP is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gemini-event-loop", daemon=True).start()
+                _LOOP = loop
+    return _LOOP
+
+
+def run_async(coro, timeout=None):
+    """Run a coroutine on the shared event loop and wait for its result.
+
+    If ``timeout`` seconds pass first, the coroutine is cancelled and
+    TimeoutError is raised.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _background_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Gemini call did not finish within {timeout}s") from None
+
+
+# ------------------------------------------------------
+# PROCESS-WIDE CLIENT (one model / HTTP pool for all sessions)
+# ------------------------------------------------------
+_SINGLETON = None
+_SINGLETON_LOCK = threading.Lock()
+
+
+def get_client():
+    global _SINGLETON
+    if _SINGLETON is None:
+        with _SINGLETON_LOCK:
+            if _SINGLETON is None:
+                _SINGLETON = GeminiClient()
+    return _SINGLETON